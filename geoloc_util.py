@@ -1,75 +1,398 @@
 #!/usr/bin/env python3
 import argparse
+import functools
+import hashlib
+import http.client
+import json
 import logging
 import os
-import requests
+import queue
+import random
+import re
+import sqlite3
+import ssl
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson is optional; the stdlib parser also accepts bytes
+    from json import loads as json_loads
+
+try:
+    import certifi
+except ImportError:  # certifi is optional; fall back to the system trust store
+    certifi = None
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
-API_KEY = os.environ.get('OPENWEATHER_API_KEY')
-if not API_KEY:
-    logger.error("OPENWEATHER_API_KEY environment variable is not set")
-    raise ValueError("OPENWEATHER_API_KEY environment variable is required")
+@functools.cache
+def _get_api_key():
+    """Return the OpenWeather API key, read from the environment on first use."""
+    api_key = os.environ.get('OPENWEATHER_API_KEY')
+    if not api_key:
+        logger.error("OPENWEATHER_API_KEY environment variable is not set")
+        raise ValueError("OPENWEATHER_API_KEY environment variable is required")
+    return api_key
+
+BASE_URL = 'https://api.openweathermap.org/geo/1.0'
+REQUEST_TIMEOUT = 10  # seconds
+MAX_WORKERS = 16  # upper bound on concurrent API requests
+ZIP_RE = re.compile(r'\A\s*(\d{5})\s*\Z', re.ASCII)  # 5-digit US zip code format
+
+# Reject obviously invalid inputs without calling the API; set GEOLOC_VALIDATE_INPUT=0 to disable
+VALIDATE_INPUT = os.environ.get('GEOLOC_VALIDATE_INPUT', '1') != '0'
+US_STATES = frozenset({
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA',
+    'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD',
+    'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ',
+    'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC',
+    'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY',
+    'DC', 'AS', 'GU', 'MP', 'PR', 'UM', 'VI',  # district and outlying areas (ISO 3166-2:US)
+})
+
+# Idle keep-alive connections shared across calls and threads, one pool per
+# (scheme, host); sized to match the worker count so no thread has to open a
+# fresh TCP/TLS connection
+_CONNECTIONS = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+def _connection_pool(parts):
+    """Return the idle connection pool for the scheme and host of a split URL."""
+    with _CONNECTIONS_LOCK:
+        return _CONNECTIONS.setdefault((parts.scheme, parts.netloc), queue.LifoQueue(maxsize=MAX_WORKERS))
+
+@functools.cache
+def _ssl_context():
+    """Return the TLS context for API connections, trusting certifi's CA bundle when installed.
+
+    Frozen builds do not always find the system trust store, so certifi should
+    be installed when building the executable.
+    """
+    if certifi is not None:
+        return ssl.create_default_context(cafile=certifi.where())
+    return ssl.create_default_context()
+
+def _new_connection(parts):
+    """Open a connection to the host of an already split URL."""
+    if parts.scheme == 'https':
+        return http.client.HTTPSConnection(parts.netloc, timeout=REQUEST_TIMEOUT, context=_ssl_context())
+    return http.client.HTTPConnection(parts.netloc, timeout=REQUEST_TIMEOUT)
+
+def http_get(url, params):
+    """Send a GET request over a pooled connection and return (status, headers, body).
+
+    Raises TimeoutError, OSError or http.client.HTTPException on network failures.
+    """
+    parts = urlsplit(url)
+    path = f'{parts.path}?{urlencode(params)}'
+    pool = _connection_pool(parts)
+    try:
+        conn, reused = pool.get_nowait(), True
+    except queue.Empty:
+        conn, reused = _new_connection(parts), False
+
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+    except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+        conn.close()
+        if not reused:
+            raise
+        # The server dropped an idle keep-alive connection; retry once on a fresh one
+        conn = _new_connection(parts)
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            raise
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        raise
+
+    try:
+        body = response.read()
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        raise
+    try:
+        pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+    return response.status, response.headers, body
+
+# Shared error results returned by fetch_api_data; callers must not mutate them
+ERR_TIMEOUT = {'error': 'API request timed out'}
+ERR_CONN = {'error': 'API connection failed'}
+ERR_NODATA = {'error': 'No data returned from API'}
+ERR_KEY = {'error': 'Invalid API key'}
+ERR_RATE = {'error': 'API rate limit exceeded'}
+ERR_UNEXPECTED = {'error': 'Unexpected API error'}
+
+# Transient failures are retried with exponential backoff plus jitter
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 16  # seconds
+
+def _read_rate_limit():
+    """Return the requests-per-minute quota from OPENWEATHER_RPM (free tier default)."""
+    value = os.environ.get('OPENWEATHER_RPM', '60')
+    try:
+        rpm = int(value)
+    except ValueError:
+        rpm = 0
+    if rpm <= 0:
+        logger.error(f'Invalid OPENWEATHER_RPM value {value!r}')
+        raise ValueError(f'OPENWEATHER_RPM must be a positive integer, got {value!r}')
+    return rpm
+
+class RateLimiter:
+    """Thread-safe sliding window allowing `rate` requests per `per` seconds.
+
+    Up to `rate` requests go out immediately; after that each one waits until
+    the oldest send in the window is `per` seconds old.
+    """
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.sent = deque()  # monotonic send times within the current window
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self.sent and now - self.sent[0] >= self.per:
+                    self.sent.popleft()
+                if len(self.sent) < self.rate:
+                    self.sent.append(now)
+                    return
+                wait = self.per - (now - self.sent[0])
+            time.sleep(wait)
+
+class AdaptiveConcurrency:
+    """Limit in-flight requests with AIMD: halve on 429, grow by 0.5 per success."""
+    def __init__(self, limit):
+        self.max_limit = float(limit)
+        self.limit = float(limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """Hold one request slot for the duration of the block."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 0.5)
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self.limit = max(1.0, self.limit * 0.5)
 
-BASE_URL = 'http://api.openweathermap.org/geo/1.0'
+@functools.cache
+def _get_rate_limiter():
+    """Return the shared rate limiter, built on first use from OPENWEATHER_RPM."""
+    return RateLimiter(rate=_read_rate_limit(), per=60.0)
 
+CONCURRENCY = AdaptiveConcurrency(MAX_WORKERS)
+
+# Successful responses are cached on disk; set GEOLOC_CACHE_PATH='' to disable
+CACHE_PATH = os.environ.get(
+    'GEOLOC_CACHE_PATH',
+    os.path.join(os.path.expanduser('~'), '.cache', 'geoloc_util', 'cache.sqlite3'),
+)
+CACHE_TTL = timedelta(days=7).total_seconds()
+
+def _cache_key(endpoint, params):
+    """Build a stable cache key from the endpoint and request params."""
+    raw = repr((endpoint, tuple(sorted(params.items())))).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def _open_cache():
+    """Open the cache database, creating it if needed."""
+    directory = os.path.dirname(CACHE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(CACHE_PATH, timeout=5)
+    conn.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL, body TEXT)')
+    conn.execute('CREATE INDEX IF NOT EXISTS responses_created ON responses (created)')  # for pruning
+    return conn
+
+def disk_cached(func):
+    """Cache successful API responses on disk; error responses are never stored.
+
+    Expired entries are pruned whenever a new response is written.
+    """
+    @functools.wraps(func)
+    def wrapper(endpoint, params):
+        if not CACHE_PATH:
+            return func(endpoint, params)
+
+        key = _cache_key(endpoint, params)
+        try:
+            with closing(_open_cache()) as conn:
+                row = conn.execute('SELECT created, body FROM responses WHERE key = ?', (key,)).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f'Response cache unavailable: {e}')
+            return func(endpoint, params)
+        if row and time.time() - row[0] < CACHE_TTL:
+            try:
+                return json_loads(row[1])
+            except ValueError as e:
+                logger.warning(f'Ignoring corrupt response cache entry: {e}')
+
+        data = func(endpoint, params)
+        if 'error' not in data:
+            try:
+                with closing(_open_cache()) as conn, conn:
+                    conn.execute('DELETE FROM responses WHERE created < ?', (time.time() - CACHE_TTL,))
+                    conn.execute(
+                        'INSERT OR REPLACE INTO responses (key, created, body) VALUES (?, ?, ?)',
+                        (key, time.time(), json.dumps(data)),
+                    )
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f'Failed to write response cache: {e}')
+        return data
+    return wrapper
+
+def _retry_delay(headers, attempt):
+    """Return seconds to wait before the next attempt, honoring Retry-After when present.
+
+    Returns None when Retry-After asks for longer than BACKOFF_CAP, since
+    retrying any earlier would only be refused again.
+    """
+    retry_after = headers.get('Retry-After')
+    if retry_after:
+        try:
+            delay = max(0.0, float(retry_after))
+        except ValueError:
+            pass  # HTTP-date form is not used by the API; fall back to backoff
+        else:
+            return delay if delay <= BACKOFF_CAP else None
+    return min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt) + random.uniform(0, 1.0)
+
+@disk_cached
 def fetch_api_data(endpoint, params):
     """Make an API call to the Open Weather Geocoding API and return the result or an error."""
     url = f'{BASE_URL}/{endpoint}'
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()  # raise an exception for 4xx/5xx status codes
+    for attempt in range(MAX_RETRIES):
+        try:
+            with CONCURRENCY.slot():
+                _get_rate_limiter().acquire()
+                status_code, headers, body = http_get(url, params)
+        except TimeoutError:
+            logger.error(f'Request to {url} timed out after {REQUEST_TIMEOUT} seconds')
+            return ERR_TIMEOUT
+        except OSError:
+            logger.error(f'Connection error while Accessing {url}')
+            return ERR_CONN
+        except http.client.HTTPException as e:
+            logger.error(f'Unexpected error while accessing {url}: {str(e)}')
+            return ERR_UNEXPECTED
+
+        if status_code >= 400:
+            if status_code == 429:
+                CONCURRENCY.on_throttle()
+            if status_code in RETRY_STATUSES and attempt < MAX_RETRIES - 1:
+                delay = _retry_delay(headers, attempt)
+                if delay is not None:
+                    logger.warning(f'HTTP error {status_code} while accessing {url}, retrying in {delay:.1f}s')
+                    time.sleep(delay)
+                    continue
+                logger.warning(f'Retry-After for {url} exceeds {BACKOFF_CAP}s, not retrying')
+            if status_code == 401:
+                logger.error('Invalid API key provided')
+                return ERR_KEY
+            elif status_code == 429:
+                logger.error('API rate limit exceeded')
+                return ERR_RATE
+            else:
+                logger.error(f'HTTP error {status_code} while accessing {url}')
+                return {'error': f'API error: {status_code}'}
+        CONCURRENCY.on_success()
 
-        data = response.json()
+        try:
+            data = json_loads(body)
+        except ValueError as e:
+            logger.error(f'Invalid JSON returned from {url}: {str(e)}')
+            return ERR_UNEXPECTED
         if not data:
             logger.warning(f'No data returned from {url} with params {params}')
-            return {'error': 'No data returned from API'}
+            return ERR_NODATA
 
         # Return first item for 'direct', full response for 'zip'
         return data[0] if endpoint == 'direct' else data
 
-    except requests.exceptions.Timeout:
-        logger.error(f'Request to {url} timed out after 10 seconds')
-        return {'error': 'API request timed out'}
-    except requests.exceptions.ConnectionError:
-        logger.error(f'Connection error while Accessing {url}')
-        return {'error': 'API connection failed'}
-    except requests.exceptions.HTTPError as e:
-        status_code = e.response.status_code
-        if status_code == 401:
-            logger.error('Invalid API key provided')
-            return {'error': 'Invalid API key'}
-        elif status_code == 429:
-            logger.error('API rate limit exceeded')
-            return {'error': 'API rate limit exceeded'}
-        else:
-            logger.error(f'HTTP error {status_code} while accessing {url}')
-            return {'error': f'API error: {status_code}'}
-    except requests.exceptions.RequestException as e:
-        logger.error(f'Unexpected error while accessing {url}: {str(e)}')
-        return {'error': 'Unexpected API error'}
-
 def fetch_location_by_city_state(query):
     """Fetch location data by city and state."""
-    params = {'q': f'{query},US', 'limit': 1, 'appid': API_KEY}
+    params = {'q': f'{query},US', 'limit': 1, 'appid': _get_api_key()}
     return fetch_api_data('direct', params)
 
 def fetch_location_by_zip(zip_code):
     """Fetch location data by zip code."""
-    params = {'zip': f'{zip_code},US', 'appid': API_KEY}
+    params = {'zip': f'{zip_code},US', 'appid': _get_api_key()}
     return fetch_api_data('zip', params)
 
-def get_location_info(location):
-    """Determine input type and fetch location data."""
-    location = location.strip()
-    if location.isdigit() and len(location) == 5:  # 5-digit US zip code format
-        data = fetch_location_by_zip(location)
+class _LookupFailed(Exception):
+    """Carries an error result out of the memoized lookup so it is not cached."""
+    def __init__(self, result):
+        super().__init__(result.get('error'))
+        self.result = result
+
+def _location_key(location):
+    """Classify a location as ('zip', code) or ('city', query), normalized so
+    equivalent inputs share one cache entry."""
+    match = ZIP_RE.match(location)
+    if match:
+        return 'zip', match.group(1)
+    return 'city', location.strip().lower()
+
+def _is_valid_location(kind, query):
+    """Return False for normalized inputs the API can never resolve."""
+    if kind == 'zip':
+        return True
+    if not query or query.isdigit():  # empty, or digits that are not a 5-digit zip
+        return False
+    parts = query.split(',')
+    if len(parts) == 2:
+        state = parts[1].strip()
+        # Only 2-letter codes are checked; full state names are left to the API
+        if len(state) == 2 and state.isalpha() and state.upper() not in US_STATES:
+            return False
+    return True
+
+@functools.lru_cache(maxsize=1024)
+def _get_location_info_cached(kind, query):
+    """Fetch location data for a normalized input; raises _LookupFailed on error."""
+    if kind == 'zip':
+        data = fetch_location_by_zip(query)
     else:
-        data = fetch_location_by_city_state(location)
+        data = fetch_location_by_city_state(query)
 
     if 'error' in data:
-        return data  # Propagate the error from fetch_api_data
+        raise _LookupFailed(data)  # Propagate the error from fetch_api_data
     return {
         'name': data.get('name', ''),
         'lat': data.get('lat', ''),
@@ -78,9 +401,50 @@ def get_location_info(location):
         'country': data.get('country', 'US')
     }
 
+def get_location_info(location):
+    """Determine input type and fetch location data.
+
+    Successful results are memoized per process and common errors are shared
+    constants, so returned dicts must not be mutated.
+    """
+    kind, query = _location_key(location)
+    if VALIDATE_INPUT and not _is_valid_location(kind, query):
+        logger.warning(f'Skipping invalid location {location.strip()!r}')
+        return ERR_NODATA
+    try:
+        return _get_location_info_cached(kind, query)
+    except _LookupFailed as e:
+        return e.result
+
 def process_locations(locations):
-    """Process multiple location inputs."""
-    return [get_location_info(location) for location in locations]
+    """Process multiple location inputs concurrently, yielding results in input order.
+
+    Each result is yielded as soon as it and all earlier ones are ready.
+    Equivalent inputs are looked up once and the result is shared. Lookups are
+    dispatched at most a few pool sizes ahead of the consumer, and pending ones
+    are cancelled if the generator is closed early.
+    """
+    keys = [_location_key(location) for location in locations]
+    if not keys:
+        return
+    workers = min(MAX_WORKERS, len(set(keys)))
+    window = 2 * workers  # unique lookups kept in flight or awaiting collection
+    last_index = {key: i for i, key in enumerate(keys)}
+    futures = {}  # key -> lookup of the first input with that key, until its last use
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        ahead = 0  # next input to dispatch
+        for i, key in enumerate(keys):
+            while ahead < len(keys) and (ahead <= i or len(futures) < window):
+                if keys[ahead] not in futures:
+                    futures[keys[ahead]] = executor.submit(get_location_info, locations[ahead])
+                ahead += 1
+            result = futures[key].result()
+            if last_index[key] == i:
+                del futures[key]
+            yield result
+    finally:
+        executor.shutdown(cancel_futures=True)
 
 def format_location(result):
     """Format a location result into a string."""
@@ -95,14 +459,30 @@ def main():
     parser.add_argument(
         '--locations',
         nargs='+',
-        required=True,
         help='List of locations (e.g., "Madison, WI" or "12345")',
     )
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='Read locations from stdin, one per line, and print one result line per input',
+    )
     args = parser.parse_args()
+    if not args.batch and args.locations is None:
+        parser.error('the following arguments are required: --locations')
+    # Fail fast on bad configuration before any lookups
+    _get_api_key()
+    _get_rate_limiter()
+
+    if args.batch:
+        # Answer each line as it arrives so a long-lived caller can pipeline requests
+        for line in sys.stdin:
+            print(format_location(get_location_info(line)), flush=True)
+        return
 
-    results = process_locations(args.locations)
-    for result in results:
-        print(format_location(result))
+    # Close explicitly so pending lookups are cancelled if printing fails (e.g. a closed pipe)
+    with closing(process_locations(args.locations)) as results:
+        for result in results:
+            print(format_location(result), flush=True)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,12 +1,27 @@
 import subprocess
 import pytest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 import os
-import requests
+import http.client
+import json
+import queue
+import sys
+import threading
+import time
+from contextlib import closing
 
-from geoloc_util import fetch_api_data, fetch_location_by_city_state, fetch_location_by_zip
+import geoloc_util
+from geoloc_util import (
+    fetch_api_data,
+    fetch_location_by_city_state,
+    fetch_location_by_zip,
+    get_location_info,
+    process_locations,
+)
 
-EXECUTABLE = './dist/geoloc_util'
+EXECUTABLE = './dist/geoloc_util/geoloc_util'
+# Environment for the executable, captured before unit test fixtures patch os.environ
+EXECUTABLE_ENV = os.environ.copy()
 
 ## Integration tests of the executable build
 @pytest.fixture(autouse=True)
@@ -15,17 +30,60 @@ def check_executable_exists():
     if not os.path.exists(EXECUTABLE):
         pytest.skip(f'Executable {EXECUTABLE} not found. Please build it with PyInstaller.')
 
+BATCH_READ_TIMEOUT = 30  # seconds to wait for each output line of the batch process
+
+@pytest.fixture(scope='session')
+def batch_process():
+    """Start one long-lived utility process in --batch mode shared by all tests.
+
+    Output lines are collected by a reader thread so reads can time out.
+    """
+    if not os.path.exists(EXECUTABLE):
+        pytest.skip(f'Executable {EXECUTABLE} not found. Please build it with PyInstaller.')
+    process = subprocess.Popen(
+        [EXECUTABLE, '--batch'],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        env=EXECUTABLE_ENV,
+        bufsize=1,  # line buffered
+    )
+    lines = queue.Queue()
+    def _read_lines():
+        for line in process.stdout:
+            lines.put(line.rstrip('\n'))
+        lines.put(None)  # EOF
+    threading.Thread(target=_read_lines, daemon=True).start()
+    yield process, lines
+    if process.poll() is None:
+        process.stdin.close()
+        process.wait(timeout=10)
+
 @pytest.fixture
-def run_utility():
-    """Fixture to run the CLI utility and return its output."""
+def run_utility(batch_process):
+    """Fixture to look up locations through the batch process and return its output.
+
+    Fails fast if the process has exited, and kills it if a line does not arrive
+    in time so later tests do not read misaligned output.
+    """
+    process, lines = batch_process
     def _run(args: list) -> str:
-        result = subprocess.run(
-            [EXECUTABLE, '--locations'] + args,
-            capture_output=True,
-            text=True,
-            check=True,  # Raise an exception if the command fails
-        )
-        return result.stdout.strip()
+        if process.poll() is not None:
+            pytest.fail(f'Batch process exited with code {process.returncode}')
+        for location in args:
+            process.stdin.write(location + '\n')
+        process.stdin.flush()
+        output = []
+        for _ in args:
+            try:
+                line = lines.get(timeout=BATCH_READ_TIMEOUT)
+            except queue.Empty:
+                process.kill()
+                pytest.fail(f'No output from batch process within {BATCH_READ_TIMEOUT} seconds')
+            if line is None:
+                pytest.fail(f'Batch process exited with code {process.wait()}')
+            output.append(line)
+        return '\n'.join(output)
     return _run
 
 @pytest.fixture
@@ -36,6 +94,7 @@ def run_utility_with_result():
             [EXECUTABLE] + args,
             capture_output=True,
             text=True,
+            env=EXECUTABLE_ENV,
         )
     return _run
 
@@ -54,21 +113,18 @@ def test_single_zip(run_utility):
     assert 'Lon:' in output
 
 @pytest.mark.parametrize(
-    'locations, expected_lines, expected_names',
+    'locations, expected_names',
     [
         (
             ['Madison, WI', '10001', 'Chicago, IL'],
-            3,
             ['Madison', 'New York', 'Chicago']
         ),
     ],
 )
-def test_multiple_locations(run_utility, locations, expected_lines, expected_names):
-    """Test multiple location inputs."""
+def test_multiple_locations(run_utility, locations, expected_names):
+    """Test multiple location inputs, one output line per input in order."""
     output = run_utility(locations)
-    lines = output.split('\n')
-    assert len(lines) == expected_lines
-    for line, name in zip(lines, expected_names):
+    for line, name in zip(output.split('\n'), expected_names, strict=True):
         assert name in line
 
 def test_invalid_location(run_utility):
@@ -80,10 +136,17 @@ def test_mixed_valid_and_invalid(run_utility):
     """Test a mix of valid and invalid inputs."""
     output = run_utility(['Madison, WI', 'XXXXXX'])
     lines = output.split('\n')
-    assert len(lines) == 2
     assert 'Madison' in lines[0]
     assert 'No data returned from API' in lines[1]
 
+def test_locations_argument(run_utility_with_result):
+    """Test passing locations on the command line."""
+    result = run_utility_with_result(['--locations', 'Madison, WI', '53703'])
+    assert result.returncode == 0
+    lines = result.stdout.strip().split('\n')
+    assert len(lines) == 2
+    assert all('Madison' in line for line in lines)
+
 def test_empty_locations_list(run_utility_with_result):
     """Test running with an empty locations list."""
     result = run_utility_with_result(['--locations'])
@@ -97,18 +160,24 @@ def test_no_locations_argument(run_utility_with_result):
     assert 'error: the following arguments are required: --locations' in result.stderr
 
 ## Unit tests for Error handling
-# Mock response class to simulate requests.get behavior
-class MockResponse:
-    def __init__(self, json_data, status_code):
-        self.json_data = json_data
-        self.status_code = status_code
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path):
+    """Give each test its own API key, response cache, memoized lookups and request limiters.
 
-    def json(self):
-        return self.json_data
+    The executable is always started with EXECUTABLE_ENV, so the patched API key
+    does not leak into integration tests.
+    """
+    geoloc_util._get_location_info_cached.cache_clear()
+    geoloc_util._get_api_key.cache_clear()
+    with patch.dict(os.environ, {'OPENWEATHER_API_KEY': 'test'}), \
+            patch('geoloc_util.CACHE_PATH', str(tmp_path / 'cache.sqlite3')), \
+            patch('geoloc_util._get_rate_limiter', return_value=geoloc_util.RateLimiter(rate=1000, per=1.0)), \
+            patch('geoloc_util.CONCURRENCY', geoloc_util.AdaptiveConcurrency(geoloc_util.MAX_WORKERS)):
+        yield
 
-    def raise_for_status(self):
-        if self.status_code >= 400:
-            raise requests.exceptions.HTTPError(response=self)
+# Build an http_get return value
+def mock_response(json_data, status_code, headers=None):
+    return status_code, headers or {}, json.dumps(json_data).encode()
 
 # New error handling tests
 @pytest.mark.parametrize(
@@ -123,35 +192,368 @@ class MockResponse:
 )
 def test_fetch_api_data_http_errors(status_code, json_data, expected_error):
     """Test fetch_api_data with various HTTP errors and empty responses."""
-    with patch('requests.get', return_value=MockResponse(json_data, status_code)):
+    with patch('geoloc_util.http_get', return_value=mock_response(json_data, status_code)), \
+            patch('geoloc_util.time.sleep'):
         result = fetch_api_data('direct', {'q': 'Madison, WI,US', 'limit': 1, 'appid': 'test'})
         assert 'error' in result
         assert result['error'] == expected_error
 
 def test_fetch_api_data_timeout():
     """Test fetch_api_data with a timeout error."""
-    with patch('requests.get', side_effect=requests.exceptions.Timeout):
+    with patch('geoloc_util.http_get', side_effect=TimeoutError):
         result = fetch_api_data('zip', {'zip': '12345,US', 'appid': 'test'})
         assert 'error' in result
         assert result['error'] == 'API request timed out'
 
 def test_fetch_api_data_connection_error():
     """Test fetch_api_data with a connection error."""
-    with patch('requests.get', side_effect=requests.exceptions.ConnectionError):
+    with patch('geoloc_util.http_get', side_effect=ConnectionRefusedError):
         result = fetch_api_data('direct', {'q': 'Madison, WI,US', 'limit': 1, 'appid': 'test'})
         assert 'error' in result
         assert result['error'] == 'API connection failed'
 
 def test_fetch_location_by_city_state_error():
     """Test fetch_location_by_city_state with an API error."""
-    with patch('requests.get', return_value=MockResponse({}, 401)):
+    with patch('geoloc_util.http_get', return_value=mock_response({}, 401)):
         result = fetch_location_by_city_state('Madison, WI')
         assert 'error' in result
         assert result['error'] == 'Invalid API key'
 
 def test_fetch_location_by_zip_error():
     """Test fetch_location_by_zip with an API error."""
-    with patch('requests.get', side_effect=requests.exceptions.Timeout):
+    with patch('geoloc_util.http_get', side_effect=TimeoutError):
         result = fetch_location_by_zip('12345')
         assert 'error' in result
-        assert result['error'] == 'API request timed out'
\ No newline at end of file
+        assert result['error'] == 'API request timed out'
+
+def test_process_locations_preserves_order():
+    """Test process_locations returns results in input order."""
+    with patch('geoloc_util.get_location_info', side_effect=lambda location: {'name': location}):
+        result = list(process_locations(['Madison, WI', '10001', 'Chicago, IL']))
+        assert [r['name'] for r in result] == ['Madison, WI', '10001', 'Chicago, IL']
+
+
+def test_missing_api_key():
+    """Test a missing API key is reported when a lookup needs it."""
+    with patch.dict(os.environ, {'OPENWEATHER_API_KEY': ''}):
+        with pytest.raises(ValueError, match='OPENWEATHER_API_KEY'):
+            fetch_location_by_zip('12345')
+
+def test_fetch_api_data_cached():
+    """Test a successful response is served from the disk cache on repeat calls."""
+    data = [{'name': 'Madison', 'lat': 43.07, 'lon': -89.4, 'state': 'Wisconsin', 'country': 'US'}]
+    params = {'q': 'Madison, WI,US', 'limit': 1, 'appid': 'test'}
+    with patch('geoloc_util.http_get', return_value=mock_response(data, 200)) as mock_get:
+        assert fetch_api_data('direct', params) == data[0]
+        assert fetch_api_data('direct', params) == data[0]
+        assert mock_get.call_count == 1
+
+def test_fetch_api_data_errors_not_cached():
+    """Test error responses are not stored in the disk cache."""
+    params = {'zip': '12345,US', 'appid': 'test'}
+    with patch('geoloc_util.http_get', return_value=mock_response({}, 401)) as mock_get:
+        fetch_api_data('zip', params)
+        fetch_api_data('zip', params)
+        assert mock_get.call_count == 2
+
+def test_fetch_api_data_corrupt_cache_entry():
+    """Test a cache entry that fails to decode is treated as a miss."""
+    data = {'zip': '53703', 'name': 'Madison', 'lat': 43.07, 'lon': -89.4, 'country': 'US'}
+    params = {'zip': '53703,US', 'appid': 'test'}
+    with closing(geoloc_util._open_cache()) as conn, conn:
+        conn.execute(
+            'INSERT INTO responses (key, created, body) VALUES (?, ?, ?)',
+            (geoloc_util._cache_key('zip', params), time.time(), '{not json'),
+        )
+    with patch('geoloc_util.http_get', return_value=mock_response(data, 200)) as mock_get:
+        assert fetch_api_data('zip', params) == data
+        assert mock_get.call_count == 1
+
+def test_fetch_api_data_prunes_expired_cache_entries():
+    """Test expired cache entries are deleted when a new response is written."""
+    with closing(geoloc_util._open_cache()) as conn, conn:
+        conn.execute(
+            'INSERT INTO responses (key, created, body) VALUES (?, ?, ?)',
+            ('stale', time.time() - geoloc_util.CACHE_TTL - 1, '{}'),
+        )
+    with patch('geoloc_util.http_get', return_value=mock_response([{'name': 'Madison'}], 200)):
+        fetch_api_data('direct', {'q': 'Madison, WI,US', 'limit': 1, 'appid': 'test'})
+    with closing(geoloc_util._open_cache()) as conn:
+        keys = [row[0] for row in conn.execute('SELECT key FROM responses')]
+    assert 'stale' not in keys
+    assert len(keys) == 1
+
+def test_cache_prune_uses_index():
+    """Test pruning expired entries does not scan the whole cache table."""
+    with closing(geoloc_util._open_cache()) as conn:
+        plan = conn.execute('EXPLAIN QUERY PLAN DELETE FROM responses WHERE created < ?', (0,)).fetchall()
+    assert any('responses_created' in row[-1] for row in plan)
+
+def test_process_locations_empty():
+    """Test process_locations yields nothing for an empty input list."""
+    assert list(process_locations([])) == []
+
+def test_process_locations_deduplicates():
+    """Test equivalent inputs are dispatched once and results scattered back in order."""
+    with patch('geoloc_util.get_location_info', side_effect=lambda location: {'name': location.strip()}) as mock_info:
+        result = list(process_locations(['Madison, WI', '10001', ' madison, wi', '10001 ']))
+        assert [r['name'] for r in result] == ['Madison, WI', '10001', 'Madison, WI', '10001']
+        assert mock_info.call_count == 2
+
+def test_process_locations_bounded_dispatch():
+    """Test lookups are dispatched in a bounded window and pending ones cancelled on close."""
+    locations = [f'City{i}, WI' for i in range(200)]
+    with patch('geoloc_util.get_location_info', side_effect=lambda location: {'name': location}) as mock_info:
+        results = process_locations(locations)
+        assert next(results) == {'name': 'City0, WI'}
+        results.close()
+        assert mock_info.call_count <= 2 * geoloc_util.MAX_WORKERS
+
+def test_process_locations_many_duplicates():
+    """Test repeated keys spread beyond the dispatch window still resolve once."""
+    locations = [f'City{i % 40}, WI' for i in range(200)]
+    with patch('geoloc_util.get_location_info', side_effect=lambda location: {'name': location}) as mock_info:
+        assert [r['name'] for r in process_locations(locations)] == locations
+        assert mock_info.call_count == 40
+
+def test_get_location_info_memoized():
+    """Test equivalent inputs within a run share one API call."""
+    data = {'name': 'Madison', 'lat': 43.07, 'lon': -89.4, 'state': 'Wisconsin', 'country': 'US'}
+    with patch('geoloc_util.fetch_location_by_city_state', return_value=data) as mock_fetch:
+        first = get_location_info('Madison, WI')
+        second = get_location_info('  madison, wi ')
+        assert first == second
+        assert mock_fetch.call_count == 1
+
+def test_get_location_info_fills_defaults():
+    """Test missing fields are defaulted and extra fields dropped."""
+    data = {'zip': '53703', 'name': 'Madison', 'lat': 43.07, 'lon': -89.4}
+    with patch('geoloc_util.fetch_location_by_zip', return_value=data):
+        assert get_location_info('53703') == {
+            'name': 'Madison', 'lat': 43.07, 'lon': -89.4, 'state': '', 'country': 'US'
+        }
+
+def test_get_location_info_errors_not_memoized():
+    """Test error results are not memoized."""
+    with patch('geoloc_util.fetch_location_by_zip', return_value={'error': 'API request timed out'}) as mock_fetch:
+        assert get_location_info('12345') == {'error': 'API request timed out'}
+        assert get_location_info('12345') == {'error': 'API request timed out'}
+        assert mock_fetch.call_count == 2
+
+def test_fetch_api_data_retries_transient_errors():
+    """Test fetch_api_data retries 5xx responses and returns the eventual success."""
+    data = {'zip': '53703', 'name': 'Madison', 'lat': 43.07, 'lon': -89.4, 'country': 'US'}
+    responses = [mock_response({}, 503), mock_response({}, 502), mock_response(data, 200)]
+    with patch('geoloc_util.http_get', side_effect=responses) as mock_get, \
+            patch('geoloc_util.time.sleep') as mock_sleep:
+        assert fetch_api_data('zip', {'zip': '53703,US', 'appid': 'test'}) == data
+        assert mock_get.call_count == 3
+        assert mock_sleep.call_count == 2
+
+def test_fetch_api_data_honors_retry_after():
+    """Test fetch_api_data waits for the Retry-After interval on 429 responses."""
+    responses = [mock_response({}, 429, {'Retry-After': '3'}), mock_response([{'name': 'Madison'}], 200)]
+    with patch('geoloc_util.http_get', side_effect=responses), \
+            patch('geoloc_util.time.sleep') as mock_sleep:
+        assert fetch_api_data('direct', {'q': 'Madison, WI,US', 'limit': 1, 'appid': 'test'}) == {'name': 'Madison'}
+        mock_sleep.assert_called_once_with(3.0)
+
+def test_fetch_api_data_gives_up_on_long_retry_after():
+    """Test fetch_api_data does not retry early when Retry-After exceeds the backoff cap."""
+    responses = [mock_response({}, 429, {'Retry-After': '60'}), mock_response([{'name': 'Madison'}], 200)]
+    with patch('geoloc_util.http_get', side_effect=responses) as mock_get, \
+            patch('geoloc_util.time.sleep') as mock_sleep:
+        assert fetch_api_data('direct', {'q': 'Madison, WI,US', 'limit': 1, 'appid': 'test'}) == {'error': 'API rate limit exceeded'}
+        assert mock_get.call_count == 1
+        mock_sleep.assert_not_called()
+
+def test_rate_limiter_waits_when_window_full():
+    """Test RateLimiter blocks until the oldest send leaves the window."""
+    clock = [0.0]
+    def fake_sleep(seconds):
+        clock[0] += seconds
+    with patch('geoloc_util.time.monotonic', side_effect=lambda: clock[0]), \
+            patch('geoloc_util.time.sleep', side_effect=fake_sleep) as mock_sleep:
+        limiter = geoloc_util.RateLimiter(rate=2, per=1.0)
+        limiter.acquire()
+        clock[0] = 0.25
+        limiter.acquire()
+        mock_sleep.assert_not_called()
+        limiter.acquire()
+        mock_sleep.assert_called_once_with(0.75)
+
+def test_rate_limiter_does_not_delay_within_quota():
+    """Test up to `rate` requests are sent without waiting."""
+    with patch('geoloc_util.time.sleep') as mock_sleep:
+        limiter = geoloc_util.RateLimiter(rate=60, per=60.0)
+        for _ in range(60):
+            limiter.acquire()
+        mock_sleep.assert_not_called()
+
+def test_rate_limiter_stays_within_quota():
+    """Test RateLimiter does not exceed its rate in the first window."""
+    clock = [0.0]
+    def fake_sleep(seconds):
+        clock[0] += seconds
+    with patch('geoloc_util.time.monotonic', side_effect=lambda: clock[0]), \
+            patch('geoloc_util.time.sleep', side_effect=fake_sleep):
+        limiter = geoloc_util.RateLimiter(rate=60, per=60.0)
+        sent = 0
+        while True:
+            limiter.acquire()
+            if clock[0] >= 60.0:
+                break
+            sent += 1
+        assert sent == 60
+
+@pytest.mark.parametrize('value', ['0', '-5', 'abc', '1.5'])
+def test_read_rate_limit_rejects_invalid_values(value):
+    """Test OPENWEATHER_RPM must be a positive integer."""
+    with patch.dict(os.environ, {'OPENWEATHER_RPM': value}):
+        with pytest.raises(ValueError, match='OPENWEATHER_RPM must be a positive integer'):
+            geoloc_util._read_rate_limit()
+
+def test_import_with_invalid_rate_limit():
+    """Test an invalid OPENWEATHER_RPM does not break importing the module or --help."""
+    env = {**EXECUTABLE_ENV, 'OPENWEATHER_RPM': 'abc'}
+    result = subprocess.run(
+        [sys.executable, geoloc_util.__file__, '--help'],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    assert result.returncode == 0
+    assert '--locations' in result.stdout
+
+def test_read_rate_limit():
+    """Test OPENWEATHER_RPM overrides the free tier quota."""
+    with patch.dict(os.environ, {'OPENWEATHER_RPM': '600'}):
+        assert geoloc_util._read_rate_limit() == 600
+
+def test_fetch_api_data_throttles_concurrency_on_429():
+    """Test a 429 response halves the adaptive concurrency limit."""
+    responses = [mock_response({}, 429), mock_response([{'name': 'Madison'}], 200)]
+    with patch('geoloc_util.http_get', side_effect=responses), \
+            patch('geoloc_util.time.sleep'), \
+            patch.object(geoloc_util.CONCURRENCY, 'on_throttle', wraps=geoloc_util.CONCURRENCY.on_throttle) as mock_throttle:
+        assert fetch_api_data('direct', {'q': 'Madison, WI,US', 'limit': 1, 'appid': 'test'}) == {'name': 'Madison'}
+        mock_throttle.assert_called_once()
+
+def test_adaptive_concurrency_aimd():
+    """Test AdaptiveConcurrency halves its limit on throttling and recovers on success."""
+    concurrency = geoloc_util.AdaptiveConcurrency(8)
+    concurrency.on_throttle()
+    concurrency.on_throttle()
+    assert concurrency.limit == 2
+    for _ in range(20):
+        concurrency.on_success()
+    assert concurrency.limit == 8
+
+@pytest.mark.parametrize('location', ['InvalidCity, XX', '', '   ', '1234', '123456'])
+def test_get_location_info_rejects_invalid_locally(location):
+    """Test obviously invalid inputs are rejected without an API call."""
+    with patch('geoloc_util.fetch_api_data') as mock_fetch:
+        assert get_location_info(location) == {'error': 'No data returned from API'}
+        mock_fetch.assert_not_called()
+
+@pytest.mark.parametrize('location', ['Madison, WI', 'Madison, Wisconsin', 'Washington, DC', 'San Juan, PR', 'Hagatna, GU', 'XXXXXX'])
+def test_get_location_info_passes_plausible_inputs(location):
+    """Test plausible inputs are still sent to the API."""
+    with patch('geoloc_util.fetch_location_by_city_state', return_value={'name': 'Somewhere'}) as mock_fetch:
+        assert get_location_info(location)['name'] == 'Somewhere'
+        mock_fetch.assert_called_once()
+
+def test_get_location_info_validation_disabled():
+    """Test local validation can be turned off so every input reaches the API."""
+    with patch('geoloc_util.VALIDATE_INPUT', False), \
+            patch('geoloc_util.fetch_location_by_city_state', return_value={'error': 'No data returned from API'}) as mock_fetch:
+        get_location_info('InvalidCity, XX')
+        mock_fetch.assert_called_once()
+
+def fake_connection(*outcomes):
+    """Build a connection whose getresponse() returns or raises each outcome in turn."""
+    conn = MagicMock()
+    responses = []
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            responses.append(outcome)
+        else:
+            response = MagicMock(status=outcome, headers={})
+            response.read.return_value = b'[]'
+            responses.append(response)
+    conn.getresponse.side_effect = responses
+    return conn
+
+@pytest.fixture
+def connection_pool():
+    """Give the test empty connection pools and return the one for https://example.com."""
+    pool = queue.LifoQueue(maxsize=geoloc_util.MAX_WORKERS)
+    with patch('geoloc_util._CONNECTIONS', {('https', 'example.com'): pool}):
+        yield pool
+
+def test_http_get_reuses_pooled_connection(connection_pool):
+    """Test a connection is returned to the pool and reused by the next request."""
+    conn = fake_connection(200, 200)
+    with patch('geoloc_util._new_connection', return_value=conn) as mock_new:
+        assert geoloc_util.http_get('https://example.com/geo', {'q': 'a'}) == (200, {}, b'[]')
+        assert geoloc_util.http_get('https://example.com/geo', {'q': 'b'}) == (200, {}, b'[]')
+        assert mock_new.call_count == 1
+        assert conn.request.call_count == 2
+        assert connection_pool.get_nowait() is conn
+
+def test_http_get_retries_stale_pooled_connection(connection_pool):
+    """Test a reused connection dropped by the server is retried once on a fresh one."""
+    stale = fake_connection(http.client.RemoteDisconnected('closed'))
+    fresh = fake_connection(200)
+    connection_pool.put_nowait(stale)
+    with patch('geoloc_util._new_connection', return_value=fresh) as mock_new:
+        assert geoloc_util.http_get('https://example.com/geo', {'q': 'a'})[0] == 200
+        assert mock_new.call_count == 1
+        stale.close.assert_called_once()
+        assert connection_pool.get_nowait() is fresh
+
+def test_http_get_does_not_retry_fresh_connection(connection_pool):
+    """Test a failure on a freshly opened connection is raised without retrying."""
+    conn = fake_connection(http.client.RemoteDisconnected('closed'))
+    with patch('geoloc_util._new_connection', return_value=conn) as mock_new:
+        with pytest.raises(http.client.RemoteDisconnected):
+            geoloc_util.http_get('https://example.com/geo', {'q': 'a'})
+        assert mock_new.call_count == 1
+        conn.close.assert_called_once()
+        assert connection_pool.empty()
+
+def test_http_get_pools_connections_per_host(connection_pool):
+    """Test a connection opened for one host is never reused for another."""
+    first, second = fake_connection(200), fake_connection(200)
+    with patch('geoloc_util._new_connection', side_effect=[first, second]) as mock_new:
+        geoloc_util.http_get('https://example.com/geo', {'q': 'a'})
+        geoloc_util.http_get('https://example.org/geo', {'q': 'a'})
+        assert mock_new.call_count == 2
+        assert mock_new.call_args.args[0].netloc == 'example.org'
+        second.request.assert_called_once()
+        assert connection_pool.get_nowait() is first
+
+def test_ssl_context_uses_certifi_bundle():
+    """Test HTTPS connections trust certifi's CA bundle when it is installed."""
+    geoloc_util._ssl_context.cache_clear()
+    certifi = MagicMock()
+    certifi.where.return_value = '/path/to/cacert.pem'
+    with patch('geoloc_util.certifi', certifi), \
+            patch('geoloc_util.ssl.create_default_context') as mock_context:
+        geoloc_util._ssl_context()
+        mock_context.assert_called_once_with(cafile='/path/to/cacert.pem')
+    geoloc_util._ssl_context.cache_clear()
+
+@pytest.mark.parametrize(
+    'location, expected_key',
+    [
+        ('53703', ('zip', '53703')),
+        ('  53703 ', ('zip', '53703')),
+        ('5370', ('city', '5370')),
+        ('537031', ('city', '537031')),
+        (' Madison, WI ', ('city', 'madison, wi')),
+    ],
+)
+def test_location_key(location, expected_key):
+    """Test zip code detection and normalization of location inputs."""
+    assert geoloc_util._location_key(location) == expected_key